@@ -1,4 +1,5 @@
 # Expose generate-logs and ingest-logs as fast api
+import asyncio
 import logging
 from fastapi import FastAPI, BackgroundTasks
 from fastapi.responses import JSONResponse
@@ -6,7 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from log_generator import generate_static_logs_for_day
 from log_ingestor import ingest_static_files
 from ticket_generator import generate_batch
-from ticket_ingestor import ingest_tickets
+from ticket_ingestor import ingest_tickets_async
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -24,16 +25,17 @@ app.add_middleware(
 )
 
 @app.post("/generate-logs", description="Generate sample logs for a specific day", tags=["Logs"])
-def generate_logs_api(input_date: str, num_logs: int):
+async def generate_logs_api(input_date: str, num_logs: int):
     try:
-        file_path = generate_static_logs_for_day(input_date, num_logs)
+        # Generation is CPU-bound, so run it in the default executor instead of on the event loop
+        file_path = await asyncio.get_running_loop().run_in_executor(None, generate_static_logs_for_day, input_date, num_logs)
         return JSONResponse(status_code=200, content={"message": "Logs generated successfully", "file_path": file_path})
     except Exception as e:
         logger.error(f"Error generating logs: {e}")
         return JSONResponse(status_code=500, content={"message": "Error generating logs"})
 
 @app.post("/ingest-logs", description="Ingest logs into a Qdrant collection", tags=["Logs"])
-def ingest_logs_api(collection_name: str, background_tasks: BackgroundTasks):
+async def ingest_logs_api(collection_name: str, background_tasks: BackgroundTasks):
     try:
         background_tasks.add_task(ingest_static_files, collection_name)
         return JSONResponse(status_code=202, content={"message": "Ingestion started", "collection_name": collection_name})
@@ -42,18 +44,19 @@ def ingest_logs_api(collection_name: str, background_tasks: BackgroundTasks):
         return JSONResponse(status_code=500, content={"message": "Error starting ingestion"})
     
 @app.post("/generate-incidents", description="Generate sample incidents for a specific day", tags=["Incidents"])
-def generate_incidents(input_date: str, num_incidents: int):
+async def generate_incidents(input_date: str, num_incidents: int):
     try:
-        file_path = generate_batch(date_str=input_date, num=num_incidents)
+        file_path = await asyncio.get_running_loop().run_in_executor(None, generate_batch, num_incidents, input_date)
         return JSONResponse(status_code=200, content={"message": "Incidents generated successfully", "file_path": file_path})
     except Exception as e:
         logger.error(f"Error generating incidents: {e}")
         return JSONResponse(status_code=500, content={"message": "Error generating incidents"})
 
 @app.post("/ingest-incidents", description="Ingest incidents into a Qdrant collection", tags=["Incidents"])
-def ingest_incidents_api(collection_name: str, background_tasks: BackgroundTasks):
+async def ingest_incidents_api(collection_name: str, background_tasks: BackgroundTasks):
     try:
-        background_tasks.add_task(ingest_incidents, collection_name)
+        # Coroutine tasks run on the event loop, so ingestion does not hold a threadpool worker
+        background_tasks.add_task(ingest_tickets_async, collection_name)
         return JSONResponse(status_code=202, content={"message": "Ingestion started", "collection_name": collection_name})
     except Exception as e:
         logger.error(f"Error starting ingestion: {e}")
@@ -2,7 +2,7 @@ import os
 import logging
 import streamlit as st
 from dotenv import load_dotenv
-from observability_engine import agentic_query
+from observability_engine import agentic_query, semantic_cache
 
 # ---- Streamlit config ----
 st.set_page_config(page_title="Observability AI Engine", layout="wide", page_icon=":mag_right:")
@@ -52,6 +52,11 @@ if user_query:
             logger.error(f"Query failed: {type(e).__name__}: {e}")
             st.error(f"Error querying logs: {e}")
 
+# ---- Cache stats ----
+# Queries run in this process, so this is where the semantic cache counters live
+st.sidebar.subheader("Query cache")
+st.sidebar.json(semantic_cache.stats())
+
 # ---- Footer ----
 st.markdown("---")
 st.write("Powered by [OpenAI](https://openai.com) and [Streamlit](https://streamlit.io)")
@@ -0,0 +1,18 @@
+import os
+import httpx
+from dotenv import load_dotenv
+
+# ---- Load environment ----
+load_dotenv()
+
+# ---- Configs ----
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 50))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+
+# ---- Shared HTTP clients ----
+# Every OpenAIEmbeddings instance in the process draws from these pools, so TLS
+# connections are kept alive and HTTP/2-multiplexed instead of opened per client
+_limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+http_client = httpx.Client(http2=True, limits=_limits, timeout=HTTP_TIMEOUT)
+http_async_client = httpx.AsyncClient(http2=True, limits=_limits, timeout=HTTP_TIMEOUT)
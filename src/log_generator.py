@@ -143,6 +143,7 @@ def generate_static_logs_for_day(date_str, num_logs=1000):
     with open(output_file, "w") as f:
         json.dump(logs, f, indent=2)
     logger.info(f"Generated {len(logs)} logs -> {output_file}")
+    return output_file
 
 # Continuously generate logs in real-time
 def stream_logs(interval_seconds=2, output_file=STREAM_LOG_DIR + "/stream_logs.jsonl"):
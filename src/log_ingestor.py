@@ -9,6 +9,7 @@ from qdrant_client import QdrantClient
 from qdrant_client.http.models import VectorParams, Distance
 from langchain_qdrant import QdrantVectorStore
 from langchain_openai import OpenAIEmbeddings
+from embeddings import http_client, http_async_client
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
@@ -33,7 +34,11 @@ LOG_BATCH = int(os.getenv("LOG_BATCH", 20))
 STREAM_LOG_INTERVAL = int(os.getenv("STREAM_LOG_INTERVAL", 10))
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-embeddings = OpenAIEmbeddings(model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"))
+embeddings = OpenAIEmbeddings(
+    model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+    http_client=http_client,
+    http_async_client=http_async_client
+)
 QDRANT_CLOUD_API_KEY = os.getenv("QDRANT_CLOUD_API_KEY")
 
 qdrant_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_CLOUD_API_KEY)
@@ -1,14 +1,24 @@
 import os
+import time
+import asyncio
+import uuid
+import hashlib
+import inspect
 import logging
+import threading
+from collections import OrderedDict
 from typing import List, Optional
 from dotenv import load_dotenv
 from pydantic import PrivateAttr
-from langchain.schema import BaseRetriever, Document, AgentAction, AgentFinish
+from langchain.schema import BaseRetriever, Document, LLMResult
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.tools import StructuredTool
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain.agents import Tool, initialize_agent
 from langchain.callbacks.base import BaseCallbackHandler
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
+from qdrant_client.http.models import VectorParams, Distance, PointStruct, SearchParams, QuantizationSearchParams
+from embeddings import http_client, http_async_client
 
 # ----------------- Load environment -----------------
 load_dotenv()
@@ -26,10 +36,91 @@ COLLECTION_LOGS = os.getenv("COLLECTION_NAME", "aks_logs")
 COLLECTION_TICKETS = os.getenv("COLLECTION_INCIDENTS", "tickets")  # renamed for clarity
 DEFAULT_K = int(os.getenv("DEFAULT_K", 5))
 THRESHOLD_LIMIT = float(os.getenv("THRESHOLD_LIMIT", 0.5))
+AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", 5))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 128))
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", 2.0))
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", 30))
+VECTOR_SIZE = int(os.getenv("VECTOR_SIZE", 1536))
+COLLECTION_CACHE = os.getenv("COLLECTION_CACHE", "semantic_cache")
+CACHE_MAX = int(os.getenv("CACHE_MAX", 256))
+CACHE_TTL = int(os.getenv("CACHE_TTL", 3600))
+CACHE_SIMILARITY = float(os.getenv("CACHE_SIMILARITY", 0.95))
+EMBEDDING_CACHE_MAX = int(os.getenv("EMBEDDING_CACHE_MAX", 10000))
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", 3600))
+
+# ----------------- Cached Embeddings -----------------
+class CachedEmbeddings(OpenAIEmbeddings):
+    """OpenAIEmbeddings with an LRU + TTL cache keyed by sha256 of the text."""
+    _cache: OrderedDict = PrivateAttr(default_factory=OrderedDict)  # sha256(text) -> (vector, created_at)
+    _cache_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[List[float]]:
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            vector, created_at = entry
+            if time.time() - created_at > EMBEDDING_CACHE_TTL:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return vector
+
+    def _cache_put(self, key: str, vector: List[float]):
+        with self._cache_lock:
+            self._cache[key] = (vector, time.time())
+            self._cache.move_to_end(key)
+            while len(self._cache) > EMBEDDING_CACHE_MAX:
+                self._cache.popitem(last=False)
+
+    def _split_cached(self, texts: List[str]):
+        keys = [self._key(t) for t in texts]
+        vectors = [self._cache_get(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        return keys, vectors, missing
+
+    def embed_documents(self, texts: List[str], chunk_size: Optional[int] = None, **kwargs) -> List[List[float]]:
+        keys, vectors, missing = self._split_cached(texts)
+        if missing:
+            fresh = super().embed_documents([texts[i] for i in missing], chunk_size=chunk_size, **kwargs)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                self._cache_put(keys[i], vector)
+        return vectors
+
+    async def aembed_documents(self, texts: List[str], chunk_size: Optional[int] = None, **kwargs) -> List[List[float]]:
+        keys, vectors, missing = self._split_cached(texts)
+        if missing:
+            fresh = await super().aembed_documents([texts[i] for i in missing], chunk_size=chunk_size, **kwargs)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                self._cache_put(keys[i], vector)
+        return vectors
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        return self.embed_documents([text], **kwargs)[0]
+
+    async def aembed_query(self, text: str, **kwargs) -> List[float]:
+        return (await self.aembed_documents([text], **kwargs))[0]
 
 # ----------------- Qdrant + Vector Stores -----------------
-qdrant_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_CLOUD_API_KEY)
-text_embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+qdrant_client = QdrantClient(
+    url=QDRANT_URL,
+    api_key=QDRANT_CLOUD_API_KEY,
+    prefer_grpc=True,
+    grpc_port=QDRANT_GRPC_PORT,
+    timeout=QDRANT_TIMEOUT
+)
+text_embeddings = CachedEmbeddings(
+    model="text-embedding-3-small",
+    http_client=http_client,
+    http_async_client=http_async_client
+)
 
 log_vector_store = QdrantVectorStore(client=qdrant_client, collection_name=COLLECTION_LOGS, embedding=text_embeddings)
 ticket_store = QdrantVectorStore(client=qdrant_client, collection_name=COLLECTION_TICKETS, embedding=text_embeddings) if COLLECTION_TICKETS else None
@@ -39,13 +130,15 @@ llm = ChatOpenAI(model=AGENT_MODEL, api_key=OPENAI_API_KEY, temperature=0)
 
 # ----------------- Callbacks -----------------
 class AgentTraceHandler(BaseCallbackHandler):
-    def on_agent_action(self, action: AgentAction, **kwargs):
-        logger.info(f"[TRACE] Agent called tool: {action.tool}")
-        logger.info(f"[TRACE] Tool input: {action.tool_input}")
-
-    def on_agent_finish(self, finish: AgentFinish, **kwargs):
-        final_output = finish.return_values.get("output", "")
-        logger.info(f"[TRACE] Agent finished with output: {final_output}")
+    def on_llm_end(self, response: LLMResult, **kwargs):
+        message = getattr(response.generations[0][0], "message", None)
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            for tool_call in tool_calls:
+                logger.info(f"[TRACE] Agent called tool: {tool_call['name']}")
+                logger.info(f"[TRACE] Tool input: {tool_call['args']}")
+        else:
+            logger.info(f"[TRACE] Agent finished with output: {response.generations[0][0].text}")
 
 # ----------------- Threshold Retriever -----------------
 class ThresholdRetriever(BaseRetriever):
@@ -53,78 +146,262 @@ class ThresholdRetriever(BaseRetriever):
     _vectorstore: QdrantVectorStore = PrivateAttr()
     _k: int = PrivateAttr()
     _threshold: float = PrivateAttr()
+    _ef_search: int = PrivateAttr()
     
-    def __init__(self, vectorstore: QdrantVectorStore, k: int = DEFAULT_K, threshold: float = THRESHOLD_LIMIT):
+    def __init__(self, vectorstore: QdrantVectorStore, k: int = DEFAULT_K, threshold: float = THRESHOLD_LIMIT, ef_search: int = HNSW_EF_SEARCH):
         super().__init__()
         self._vectorstore = vectorstore
         self._k = k
         self._threshold = threshold
+        self._ef_search = ef_search
+
+    def _to_document(self, point) -> Document:
+        payload = point.payload or {}
+        metadata = dict(payload.get(self._vectorstore.metadata_payload_key) or {})
+        metadata["_id"] = point.id
+        metadata["_collection_name"] = self._vectorstore.collection_name
+        return Document(page_content=payload.get(self._vectorstore.content_payload_key, ""), metadata=metadata)
 
     def _get_relevant_documents(self, query: str) -> List[Document]:
-        docs_and_scores = self._vectorstore.similarity_search_with_score(query, k=self._k)
+        # Query the client directly so the HNSW beam width (hnsw_ef) is under our control.
+        # Over-fetch on the int8 index, then rescore the candidates with full vectors to keep recall.
+        search_params = SearchParams(
+            hnsw_ef=self._ef_search,
+            quantization=QuantizationSearchParams(rescore=True, oversampling=QUANTIZATION_OVERSAMPLING)
+        )
+        points = self._vectorstore.client.query_points(
+            collection_name=self._vectorstore.collection_name,
+            query=self._vectorstore.embeddings.embed_query(query),
+            limit=self._k,
+            score_threshold=self._threshold,  # filtered server-side, so low-score payloads are never sent
+            search_params=search_params,
+            with_payload=True
+        ).points
         filtered_docs = []
-        for d, s in docs_and_scores:
-            if s >= self._threshold:
-                d.metadata = dict(d.metadata or {})
-                d.metadata["similarity_score"] = s
-                filtered_docs.append(d)
+        for point in points:
+            d = self._to_document(point)
+            d.metadata["similarity_score"] = point.score
+            filtered_docs.append(d)
         if not filtered_docs:
             logger.info(f"No documents passed threshold {self._threshold}")
         return filtered_docs
 
     async def _aget_relevant_documents(self, query: str) -> List[Document]:
-        return self._get_relevant_documents(query)
+        # QdrantVectorStore only wraps the sync client, so run the search off the event loop
+        return await asyncio.to_thread(self._get_relevant_documents, query)
+
+# ----------------- Semantic Cache -----------------
+class SemanticCache:
+    """LRU + TTL cache of agent answers, matched by exact query hash or by query similarity."""
+
+    def __init__(self, embedding: OpenAIEmbeddings, max_size: int = CACHE_MAX, ttl: int = CACHE_TTL, similarity: float = CACHE_SIMILARITY):
+        # Prior queries live in a private in-memory collection, never in the shared Qdrant instance
+        client = QdrantClient(location=":memory:")
+        client.create_collection(
+            collection_name=COLLECTION_CACHE,
+            vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+        )
+        self._store = QdrantVectorStore(client=client, collection_name=COLLECTION_CACHE, embedding=embedding)
+        self._entries: OrderedDict = OrderedDict()  # sha256(query) -> (answer, created_at)
+        self._lock = threading.Lock()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._similarity = similarity
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _point_id(key: str) -> str:
+        return str(uuid.UUID(key[:32]))
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            answer, created_at = entry
+            if time.time() - created_at > self._ttl:
+                self._evict(key)
+                return None
+            self._entries.move_to_end(key)
+            return answer
+
+    def _evict(self, key: str):
+        # Callers hold self._lock
+        self._entries.pop(key, None)
+        self._store.delete(ids=[self._point_id(key)])
+
+    def get(self, query: str) -> Optional[str]:
+        """Return the cached answer for this query or for a near-duplicate of it."""
+        answer = self._lookup(self._key(query))
+        if answer is None and self._entries:
+            # Embed outside the lock; the in-memory client itself is not thread-safe, so searches hold it
+            vector = self._store.embeddings.embed_query(query)
+            with self._lock:
+                matches = self._store.similarity_search_with_score_by_vector(vector, k=1)
+            if matches and matches[0][1] >= self._similarity:
+                answer = self._lookup(matches[0][0].metadata.get("key", ""))
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return answer
+
+    def put(self, query: str, answer: str):
+        """Cache an answer under the query's hash and its embedding."""
+        key = self._key(query)
+        created_at = time.time()
+        vector = self._store.embeddings.embed_query(query)
+        with self._lock:
+            self._store.client.upsert(
+                collection_name=self._store.collection_name,
+                points=[PointStruct(
+                    id=self._point_id(key),
+                    vector=vector,
+                    payload={
+                        self._store.content_payload_key: query,
+                        self._store.metadata_payload_key: {"key": key, "answer": answer, "ts": created_at}
+                    }
+                )]
+            )
+            self._entries[key] = (answer, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                oldest_key = next(iter(self._entries))
+                self._evict(oldest_key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "max_size": self._max_size, "ttl": self._ttl}
+
+semantic_cache = SemanticCache(text_embeddings)
 
 # ----------------- Tools -----------------
+log_retriever = ThresholdRetriever(log_vector_store)
+ticket_retriever = ThresholdRetriever(ticket_store) if ticket_store else None
+
 def search_logs(query: str) -> List[Document]:
-    retriever = ThresholdRetriever(log_vector_store)
-    return retriever.get_relevant_documents(query)
+    return log_retriever.get_relevant_documents(query)
 
 def search_tickets(query: str) -> List[Document]:
-    if not ticket_store:
+    if not ticket_retriever:
         return []
-    retriever = ThresholdRetriever(ticket_store)
-    return retriever.get_relevant_documents(query)
+    return ticket_retriever.get_relevant_documents(query)
 
-def summarize_logs_and_tickets(log_docs: List[Document], ticket_docs: Optional[List[Document]] = None) -> str:
-    """Summarize logs and optionally show related system tickets."""
-    if not log_docs and not ticket_docs:
-        return "No logs or system tickets found for your query."
+async def asearch_logs(query: str) -> List[Document]:
+    return await log_retriever.aget_relevant_documents(query)
+
+async def asearch_tickets(query: str) -> List[Document]:
+    if not ticket_retriever:
+        return []
+    return await ticket_retriever.aget_relevant_documents(query)
 
-    log_text = "\n".join([d.page_content for d in log_docs]) if log_docs else ""
-    summary_prompt = f"Summarize the following logs into a concise human-readable summary of key issues:\n{log_text}"
-    summary = llm.invoke(summary_prompt).content.strip() if log_text else "No logs found."
+async def asearch_logs_and_tickets(query: str) -> dict:
+    """Search logs and tickets concurrently."""
+    # Embed once up front so both searches hit the embedding cache instead of racing to embed.
+    # Uses the sync client: the async pool cannot be reused across the asyncio.run calls of the sync wrapper.
+    await asyncio.to_thread(text_embeddings.embed_query, query)
+    log_docs, ticket_docs = await asyncio.gather(asearch_logs(query), asearch_tickets(query))
+    return {"logs": log_docs, "tickets": ticket_docs}
 
-    output = [summary]
+def search_logs_and_tickets(query: str) -> dict:
+    """Sync wrapper for asearch_logs_and_tickets. Inside a running event loop, await the async version instead."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(asearch_logs_and_tickets(query))
+    raise RuntimeError("search_logs_and_tickets cannot be called from a running event loop; await asearch_logs_and_tickets instead.")
 
-    if ticket_docs:
-        output.append("\nRelated System Tickets:")
-        for doc in ticket_docs:
-            ticket_id = doc.metadata.get("ticketId", "")
-            message = doc.page_content.strip()
-            output.append(f"{ticket_id} → {message}" if ticket_id else message)
+def summarize_logs_and_tickets(log_docs: List[Document], ticket_docs: Optional[List[Document]] = None) -> str:
+    """Summarize logs and related system tickets in a single LLM call."""
+    log_text = "\n".join(d.page_content.strip() for d in log_docs or [])
+    ticket_text = "\n\n".join(d.page_content.strip() for d in ticket_docs or [])
+    if not log_text and not ticket_text:
+        return "No logs or system tickets found for your query."
+
+    summary_prompt = (
+        "Summarize the following logs and related system tickets into a concise human-readable summary of key issues. "
+        "Reference ticket IDs where a ticket relates to the log findings.\n\n"
+        f"Logs:\n{log_text or 'None found.'}\n\n"
+        f"System tickets:\n{ticket_text or 'None found.'}"
+    )
+    return llm.invoke(summary_prompt).content.strip()
 
-    return "\n".join(output)
+def format_search_results(results: dict) -> str:
+    """Render search results as compact text for a tool message."""
+    lines = ["Logs:"]
+    lines += [f"- {d.page_content.strip()}" for d in results["logs"]] or ["- none"]
+    lines.append("Tickets:")
+    lines += [f"- {d.page_content.strip()}" for d in results["tickets"]] or ["- none"]
+    return "\n".join(lines)
 
 # ----------------- Agent -----------------
+AGENT_SYSTEM_PROMPT = (
+    "You are an observability assistant for a Kubernetes platform. "
+    "Use the SearchLogsAndTickets tool to find logs and system tickets relevant to the user's question, "
+    "then answer concisely based only on what was retrieved."
+)
+
 tools = [
-    Tool(name="SearchLogs", func=search_logs, description="Search logs based on user query"),
-    Tool(name="SearchTickets", func=search_tickets, description="Search related system tickets"),
-    Tool(name="SummarizeLogs", func=lambda text: summarize_logs_and_tickets([], []), description="Summarize logs"),
+    StructuredTool.from_function(
+        func=search_logs_and_tickets,
+        coroutine=asearch_logs_and_tickets,
+        name="SearchLogsAndTickets",
+        description="Search logs and related system tickets based on user query"
+    ),
 ]
+tool_funcs = {"SearchLogsAndTickets": search_logs_and_tickets}
 
-agent = initialize_agent(
-    tools,
-    llm,
-    agent="zero-shot-react-description",
-    verbose=True,
-    callbacks=[AgentTraceHandler()]
-)
+agent_llm = llm.bind_tools(tools)
+agent_callbacks = [AgentTraceHandler()]
+
+def run_agent(user_query: str) -> str:
+    """Tool-calling loop: call the LLM, run the tools it asks for, repeat until it answers."""
+    messages = [SystemMessage(content=AGENT_SYSTEM_PROMPT), HumanMessage(content=user_query)]
+    log_docs, ticket_docs = [], []
+    for _ in range(AGENT_MAX_ITERATIONS):
+        response = agent_llm.invoke(messages, config={"callbacks": agent_callbacks})
+        messages.append(response)
+        if not response.tool_calls:
+            return response.content
+
+        for tool_call in response.tool_calls:
+            func = tool_funcs.get(tool_call["name"])
+            if func is None:
+                content = f"Unknown tool: {tool_call['name']}"
+            else:
+                try:
+                    inspect.signature(func).bind(**tool_call["args"])
+                except TypeError as e:
+                    # Bad arguments go back to the model so it can correct its call; tool failures propagate
+                    logger.warning(f"Invalid arguments for {tool_call['name']}: {e}")
+                    content = f"Invalid arguments for {tool_call['name']}: {e}"
+                else:
+                    results = func(**tool_call["args"])
+                    log_docs += results["logs"]
+                    ticket_docs += results["tickets"]
+                    content = format_search_results(results)
+            messages.append(ToolMessage(content=content, tool_call_id=tool_call["id"]))
+
+    # The model's final message already answers from the tool results, so the summary is only a fallback
+    logger.warning(f"Agent did not answer within {AGENT_MAX_ITERATIONS} iterations, summarizing retrieved documents")
+    return summarize_logs_and_tickets(log_docs, ticket_docs)
 
 def agentic_query(user_query: str) -> str:
     """Run the user query through the agent."""
     logger.info(f"Agentic query: {user_query}")
-    return agent.run(user_query)
+    cached_answer = semantic_cache.get(user_query)
+    if cached_answer is not None:
+        logger.info("Semantic cache hit, skipping agent run")
+        return cached_answer
+    answer = run_agent(user_query)
+    semantic_cache.put(user_query, answer)
+    return answer
 
 # ----------------- CLI -----------------
 if __name__ == "__main__":
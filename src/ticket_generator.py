@@ -1,10 +1,12 @@
 import os
-import json
+import gzip
 import random
 import datetime
 import logging
 import uuid
 from pathlib import Path
+import numpy as np
+import orjson
 from log_generator import APPLICATIONS, NAMESPACES, NODES  # reuse constants
 
 # Logging
@@ -14,68 +16,84 @@ logger = logging.getLogger(__name__)
 TICKET_DIR = "tickets"
 os.makedirs(TICKET_DIR, exist_ok=True)
 
-TICKET_TYPES = ["DatabaseTimeout", "HighCPU", "HighMemory", "PodCrash", "AuthFailure"]
+# Map ticket_type to (message template, resolution)
+TICKET_TEMPLATES = {
+    "DatabaseTimeout": ("Database connection timeout in {namespace} for {app}", "Check DB connectivity and restart DB pods if necessary."),
+    "HighCPU": ("High CPU usage detected on {node} in {namespace}", "Investigate running pods, consider scaling node pool."),
+    "HighMemory": ("High memory usage detected on {pod} in {namespace}", "Investigate memory leaks, restart pods, consider scaling memory limits."),
+    "PodCrash": ("{pod} crashed in {namespace}", "Check pod logs and redeploy if necessary."),
+    "AuthFailure": ("Multiple failed login attempts in {namespace}", "Investigate security issues and reset affected credentials."),
+}
+TICKET_TYPES = list(TICKET_TEMPLATES)
 
-def generate_ticket(i: int, timestamp=None):
-    """Generate a synthetic ticket aligned with logs."""
-    if timestamp is None:
-        timestamp = datetime.datetime.utcnow()
-
-    namespace = random.choice(NAMESPACES)
-    app = random.choice(APPLICATIONS)
-    pod = f"{app}-pod-{random.randint(1,5)}"
-    node = random.choice(NODES)
-    ticket_type = random.choice(TICKET_TYPES)
-
-    # Map ticket_type to message and resolution
-    if ticket_type == "DatabaseTimeout":
-        message = f"Database connection timeout in {namespace} for {app}"
-        resolution = "Check DB connectivity and restart DB pods if necessary."
-    elif ticket_type == "HighCPU":
-        message = f"High CPU usage detected on {node} in {namespace}"
-        resolution = "Investigate running pods, consider scaling node pool."
-    elif ticket_type == "HighMemory":
-        message = f"High memory usage detected on {pod} in {namespace}"
-        resolution = "Investigate memory leaks, restart pods, consider scaling memory limits."
-    elif ticket_type == "PodCrash":
-        message = f"{pod} crashed in {namespace}"
-        resolution = "Check pod logs and redeploy if necessary."
-    elif ticket_type == "AuthFailure":
-        message = f"Multiple failed login attempts in {namespace}"
-        resolution = "Investigate security issues and reset affected credentials."
-
-    ticket = {
+def _build_ticket(i, timestamp, namespace, app, pod, node, ticket_type):
+    """Assemble a ticket dict from already-chosen fields."""
+    message_template, resolution = TICKET_TEMPLATES[ticket_type]
+    return {
         "ticketId": f"INC{i:09d}",
-        "timestamp": timestamp.isoformat() + "Z",
+        "timestamp": timestamp,
         "namespace": namespace,
         "pod": pod,
         "application": app,
         "node": node,
         "ticketType": ticket_type,
-        "message": message,
+        "message": message_template.format(namespace=namespace, app=app, pod=pod, node=node),
         "suggestedAction": resolution,
         "traceId": str(uuid.uuid4())  # optional: fake link to a log trace
     }
 
-    return ticket
+def generate_ticket(i: int, timestamp=None):
+    """Generate a synthetic ticket aligned with logs. timestamp may be a datetime or a preformatted ISO string."""
+    if timestamp is None:
+        timestamp = datetime.datetime.now(datetime.UTC)
+    if isinstance(timestamp, datetime.datetime):
+        timestamp = timestamp.replace(tzinfo=None).isoformat() + "Z"
+
+    namespace = random.choice(NAMESPACES)
+    app = random.choice(APPLICATIONS)
+    pod = f"{app}-pod-{random.randint(1,5)}"
+    node = random.choice(NODES)
+    ticket_type = random.choice(TICKET_TYPES)
+    return _build_ticket(i, timestamp, namespace, app, pod, node, ticket_type)
+
+def _generate_batch_vectorized(num, date):
+    """Generate num tickets spread over the day, drawing every random field in one NumPy call."""
+    if num <= 0:
+        return []
+    rng = np.random.default_rng()
+    ns_idx = rng.integers(0, len(NAMESPACES), size=num).tolist()
+    app_idx = rng.integers(0, len(APPLICATIONS), size=num).tolist()
+    node_idx = rng.integers(0, len(NODES), size=num).tolist()
+    type_idx = rng.integers(0, len(TICKET_TYPES), size=num).tolist()
+    pod_nums = rng.integers(1, 6, size=num).tolist()
+    offsets = (np.arange(1, num + 1) * (86400 / num)).astype(np.int64).astype("timedelta64[s]")
+    timestamps = np.datetime_as_string(np.datetime64(date, "s") + offsets, unit="s").tolist()
+
+    tickets = []
+    rows = zip(ns_idx, app_idx, node_idx, type_idx, pod_nums, timestamps)
+    for i, (ns_i, app_i, node_i, type_i, pod_num, timestamp) in enumerate(rows, start=1):
+        app = APPLICATIONS[app_i]
+        tickets.append(_build_ticket(
+            i, timestamp + "Z", NAMESPACES[ns_i], app, f"{app}-pod-{pod_num}", NODES[node_i], TICKET_TYPES[type_i]
+        ))
+    return tickets
 
 def generate_batch(num=10, date_str=None):
     """Generate a batch of tickets and save to a daily JSON file."""
     if date_str is None:
-        date_str = datetime.datetime.utcnow().strftime("%Y-%m-%d")
+        date_str = datetime.datetime.now(datetime.UTC).strftime("%Y-%m-%d")
 
-    tickets = []
     date = datetime.datetime.strptime(date_str, "%Y-%m-%d")
-    for i in range(1, num + 1):
-        seconds_offset = int((86400 / num) * i)
-        timestamp = date + datetime.timedelta(seconds=seconds_offset)
-        tickets.append(generate_ticket(i, timestamp=timestamp))
+    tickets = _generate_batch_vectorized(num, date)
 
-    output_file = os.path.join(TICKET_DIR, f"tickets_{date_str}.json")
-    with open(output_file, "w") as f:
-        json.dump(tickets, f, indent=2)
+    output_file = os.path.join(TICKET_DIR, f"tickets_{date_str}.json.gz")
+    with gzip.open(output_file, "wb", compresslevel=6) as f:
+        f.write(orjson.dumps(tickets, option=orjson.OPT_APPEND_NEWLINE))
+    # Drop a plain file left by older runs for the same day so it is not ingested alongside this one
+    Path(output_file.removesuffix(".gz")).unlink(missing_ok=True)
 
     logger.info(f"Generated {len(tickets)} tickets for {date_str} -> {output_file}")
+    return output_file
 
 if __name__ == "__main__":
     import argparse
@@ -1,14 +1,32 @@
 import os
-import json
-import time
+import gzip
+import uuid
+import asyncio
 import logging
+import threading
+from itertools import islice
 from glob import glob
 from pathlib import Path
+from typing import List
+import ijson
+import orjson
 from dotenv import load_dotenv
+from aiolimiter import AsyncLimiter
+from openai import RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 from langchain_openai import OpenAIEmbeddings
+from embeddings import http_client, http_async_client
 from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams, Distance
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import (
+    VectorParams,
+    Distance,
+    PointStruct,
+    HnswConfigDiff,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+)
 from langchain.schema import Document
 
 # ---- Load environment ----
@@ -24,89 +42,232 @@ logger = logging.getLogger(__name__)
 # ---- Configs ----
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 QDRANT_CLOUD_API_KEY = os.getenv("QDRANT_CLOUD_API_KEY")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", 30))
 VECTOR_SIZE = int(os.getenv("VECTOR_SIZE", 1536))
-BATCH_SIZE = int(os.getenv("BATCH_SIZE", 10))
-BATCH_SLEEP_TIME = int(os.getenv("BATCH_SLEEP_TIME", 2))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 512))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", 4))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", 256))
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", EMBED_BATCH_SIZE * EMBED_WORKERS))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))
+TRACKER_FLUSH_EVERY = int(os.getenv("TRACKER_FLUSH_EVERY", 10))
+HNSW_M = int(os.getenv("HNSW_M", 32))
+HNSW_EF_CONSTRUCT = int(os.getenv("HNSW_EF_CONSTRUCT", 256))
+EMBED_RATE_LIMIT = int(os.getenv("EMBED_RATE_LIMIT", 3500))  # embedding requests per minute
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-TICKETS_FILES = Path(os.getenv("TICKETS_FILES", "./tickets/*.json"))
+TICKETS_FILES = Path(os.getenv("TICKETS_FILES", "./tickets/*.json"))  # gzipped copies (<pattern>.gz) are matched too
 INGESTION_TRACKER_FILE = Path(os.getenv("INGESTION_TRACKER_FILE", "./ingest-tracker/ingested_tickets.json"))
 TICKET_COLLECTION = os.getenv("TICKET_COLLECTION", "tickets")
 
 # ---- Qdrant client and embeddings ----
-qdrant_client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_CLOUD_API_KEY)
-embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+qdrant_client = AsyncQdrantClient(
+    url=QDRANT_URL,
+    api_key=QDRANT_CLOUD_API_KEY,
+    prefer_grpc=True,
+    grpc_port=QDRANT_GRPC_PORT,
+    timeout=QDRANT_TIMEOUT
+)
+embeddings = OpenAIEmbeddings(model=EMBEDDING_MODEL, http_client=http_client, http_async_client=http_async_client)
+embed_rate_limiter = AsyncLimiter(EMBED_RATE_LIMIT, 60)
 
 # ---- Track ingested files ----
 def load_ingested_files():
     if INGESTION_TRACKER_FILE.exists():
-        with open(INGESTION_TRACKER_FILE, "r") as f:
-            return set(json.load(f))
+        with open(INGESTION_TRACKER_FILE, "rb") as f:
+            return set(orjson.loads(f.read()))
     return set()
 
-def save_ingested_file(file_path):
-    ingested = load_ingested_files()
-    ingested.add(str(file_path))
-    INGESTION_TRACKER_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(INGESTION_TRACKER_FILE, "w") as f:
-        json.dump(list(ingested), f)
+# In-run cache of the tracker; reloaded from disk at the start of every run so other
+# processes' entries and hand edits are picked up, then only touched in memory until a flush
+_INGESTED = load_ingested_files()
+_unflushed = set()  # recorded this run but not yet written
+_IN_FLIGHT = set()  # claimed by a run in this process and not finished yet
+# Flushes run in worker threads: one lock guards the sets, the other serializes the read-merge-write
+_tracker_lock = threading.Lock()
+_flush_lock = threading.Lock()
+
+async def reload_ingested_files():
+    on_disk = await asyncio.to_thread(load_ingested_files)
+    with _tracker_lock:
+        _INGESTED.clear()
+        _INGESTED.update(on_disk | _unflushed)
+
+async def save_ingested_file(file_path):
+    with _tracker_lock:
+        _INGESTED.add(str(file_path))
+        _unflushed.add(str(file_path))
+        flush_due = len(_unflushed) >= TRACKER_FLUSH_EVERY
+    if flush_due:
+        await asyncio.to_thread(_flush_tracker)
+
+def _flush_tracker():
+    """Merge new entries into the tracker on disk and write it atomically so a crash mid-write never leaves a truncated file."""
+    with _flush_lock:
+        with _tracker_lock:
+            new_entries = set(_unflushed)
+        merged = load_ingested_files() | new_entries
+        INGESTION_TRACKER_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = INGESTION_TRACKER_FILE.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(orjson.dumps(sorted(merged)))
+        os.replace(tmp_file, INGESTION_TRACKER_FILE)
+        with _tracker_lock:
+            _INGESTED.update(merged)
+            _unflushed.difference_update(new_entries)
+
+# ---- Stream ticket files ----
+def iter_tickets(file_path):
+    """Yield tickets one at a time from a JSON array file (optionally gzipped) without loading it whole."""
+    opener = gzip.open if str(file_path).endswith(".gz") else open
+    with opener(file_path, "rb") as f:
+        yield from ijson.items(f, "item", use_float=True)
+
+def iter_chunks(items, size):
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 # ---- Create collection if not exists ----
-def create_collection_if_not_exists(collection_name: str):
-    existing = [c.name for c in qdrant_client.get_collections().collections]
+async def create_collection_if_not_exists(collection_name: str):
+    existing = [c.name for c in (await qdrant_client.get_collections()).collections]
     if collection_name not in existing:
-        qdrant_client.create_collection(
+        await qdrant_client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+            vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
+            hnsw_config=HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT),
+            # int8 copies of the vectors stay in RAM for search; full vectors are only read for rescoring
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
         )
         logger.info(f"Collection '{collection_name}' created.")
     else:
         logger.info(f"Collection '{collection_name}' already exists.")
 
+# ---- Embed and upsert ----
+@retry(
+    retry=retry_if_exception_type(RateLimitError),
+    wait=wait_exponential_jitter(max=60),
+    stop=stop_after_attempt(6),
+    reraise=True
+)
+async def embed_batch(texts: List[str]) -> List[List[float]]:
+    async with embed_rate_limiter:
+        return await embeddings.aembed_documents(texts)
+
+async def upsert_documents(collection_name: str, docs: List[Document], ids: List[str]):
+    """Embed docs in large concurrent batches and upsert them in the QdrantVectorStore payload layout."""
+    texts = [d.page_content for d in docs]
+    text_batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    embed_slots = asyncio.Semaphore(EMBED_WORKERS)
+
+    async def embed_slice(batch: List[str]) -> List[List[float]]:
+        async with embed_slots:
+            return await embed_batch(batch)
+
+    results = await asyncio.gather(*(embed_slice(batch) for batch in text_batches))
+    vectors = [vector for batch in results for vector in batch]
+
+    points = [
+        PointStruct(
+            id=point_id,
+            vector=vector,
+            payload={QdrantVectorStore.CONTENT_KEY: doc.page_content, QdrantVectorStore.METADATA_KEY: doc.metadata}
+        )
+        for point_id, doc, vector in zip(ids, docs, vectors)
+    ]
+    # Upsert batches concurrently over the shared async client instead of spawning uploader processes
+    await asyncio.gather(*(
+        qdrant_client.upsert(collection_name=collection_name, points=points[i:i + UPSERT_BATCH_SIZE])
+        for i in range(0, len(points), UPSERT_BATCH_SIZE)
+    ))
+    logger.info(f"Uploaded {len(docs)} tickets to '{collection_name}'")
+
 # ---- Ingest tickets ----
-def ingest_tickets(collection_name: str = TICKET_COLLECTION):
-    create_collection_if_not_exists(collection_name)
-    vector_store = QdrantVectorStore(client=qdrant_client, collection_name=collection_name, embedding=embeddings)
+def _next_batch(chunks, file_path: str):
+    """Parse the next chunk of tickets into Documents and point IDs, or return None at end of file."""
+    ticket_data = next(chunks, None)
+    if ticket_data is None:
+        return None
+    # Parsed tickets are fresh per chunk and never mutated, so they are used as metadata without copying
+    docs = [
+        Document(
+            page_content=(
+                f"Ticket ID: {t['ticketId']}\n"
+                f"Ticket Type: {t['ticketType']}\n"
+                f"Message: {t['message']}\n"
+                f"Suggested Action: {t['suggestedAction']}"
+            ),
+            metadata=t
+        )
+        for t in ticket_data
+    ]
+    # IDs derive from file and ticket, so a re-run after a partial ingest overwrites instead of duplicating
+    ids = [str(uuid.uuid5(uuid.NAMESPACE_URL, f"{file_path}:{t['ticketId']}")) for t in ticket_data]
+    return docs, ids
+
+async def _ingest_one_file(file_path: str, collection_name: str):
+    logger.info(f"Ingesting ticket file: {file_path}")
+
+    # Tickets are parsed and embedded chunk by chunk, so memory stays flat regardless of file size
+    chunks = iter_chunks(iter_tickets(file_path), INGEST_CHUNK_SIZE)
+    while True:
+        # Only parsing is guarded; errors from embedding or upserting propagate to the caller.
+        # Parsing is CPU-bound, so it runs in a worker thread to keep the event loop responsive.
+        try:
+            batch = await asyncio.to_thread(_next_batch, chunks, file_path)
+        except (ijson.JSONError, KeyError) as e:
+            logger.error(f"Failed to parse {file_path}: {e}")
+            return
+        if batch is None:
+            break
+        docs, ids = batch
+        await upsert_documents(collection_name, docs, ids)
+
+    await save_ingested_file(file_path)
+    logger.info(f"Finished ingestion of {file_path} into '{collection_name}'.")
 
-    ingested_files = load_ingested_files()
-    files = glob(str(TICKETS_FILES))
+async def ingest_tickets_async(collection_name: str = TICKET_COLLECTION):
+    await create_collection_if_not_exists(collection_name)
+    await reload_ingested_files()
+
+    gz_files = glob(f"{TICKETS_FILES}.gz")
+    # A plain file with a gzipped sibling is a stale copy of the same day, so only the .gz is ingested
+    files = gz_files + [f for f in glob(str(TICKETS_FILES)) if f"{f}.gz" not in gz_files]
     if not files:
         logger.warning(f"No ticket files found at {TICKETS_FILES}")
         return
 
+    # Check and claim each file with no await in between, so overlapping runs never pick up the same file
+    pending_files = []
     for file_path in files:
-        if file_path in ingested_files:
+        if file_path in _INGESTED:
             logger.info(f"Skipping already ingested file: {file_path}")
-            continue
+        elif file_path in _IN_FLIGHT:
+            logger.info(f"Skipping file already being ingested: {file_path}")
+        else:
+            _IN_FLIGHT.add(file_path)
+            pending_files.append(file_path)
 
-        logger.info(f"Ingesting ticket file: {file_path}")
+    # Files are independent I/O-bound jobs; run up to INGEST_WORKERS of them at once
+    file_slots = asyncio.Semaphore(INGEST_WORKERS)
 
-        try:
-            with open(file_path, "r") as f:
-                ticket_data = json.load(f)
-        except Exception as e:
-            logger.error(f"Failed to parse {file_path}: {e}")
-            continue
-
-        docs = []
-        for ticket in ticket_data:
-            text_content = (
-                f"Ticket ID: {ticket.get('ticketId')}\n"
-                f"Ticket Type: {ticket.get('ticketType')}\n"
-                f"Message: {ticket.get('message')}\n"
-                f"Suggested Action: {ticket.get('suggestedAction')}"
-            )
-            metadata = ticket.copy()  # use ticketId from JSON
-            docs.append(Document(page_content=text_content, metadata=metadata))
-
-        # Ingest in batches
-        for i in range(0, len(docs), BATCH_SIZE):
-            batch = docs[i:i + BATCH_SIZE]
-            vector_store.add_documents(batch)
-            logger.info(f"Ingested batch {i // BATCH_SIZE + 1} ({len(batch)} tickets)")
-            time.sleep(BATCH_SLEEP_TIME)
-
-        save_ingested_file(file_path)
-        logger.info(f"Finished ingestion of tickets into '{collection_name}'.")
+    async def ingest_with_slot(file_path: str):
+        async with file_slots:
+            await _ingest_one_file(file_path, collection_name)
+
+    # Flush whatever is left and release the claims at the end of the run, even if a file fails mid-way
+    try:
+        results = await asyncio.gather(*(ingest_with_slot(p) for p in pending_files), return_exceptions=True)
+        for file_path, result in zip(pending_files, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to ingest {file_path}: {result}")
+    finally:
+        _IN_FLIGHT.difference_update(pending_files)
+        await asyncio.to_thread(_flush_tracker)
+
+def ingest_tickets(collection_name: str = TICKET_COLLECTION):
+    asyncio.run(ingest_tickets_async(collection_name))
 
 # ---- CLI support ----
 if __name__ == "__main__":